@@ -15,6 +15,7 @@
 
 
 from swift.account.backend import AccountBroker
+from swift.common.db import config_db_pragmas
 from swift.common.exceptions import InvalidAccountInfo
 from swift.common.db_auditor import DatabaseAuditor
 
@@ -25,6 +26,10 @@ class AccountAuditor(DatabaseAuditor):
     server_type = "account"
     broker_class = AccountBroker
 
+    def __init__(self, conf, logger=None):
+        super(AccountAuditor, self).__init__(conf, logger=logger)
+        config_db_pragmas(conf)
+
     def _audit(self, info, broker):
         # Validate per policy counts
         policy_stats = broker.get_policy_stats(do_migrations=True)
@@ -283,6 +283,29 @@ class AccountBroker(DatabaseBroker):
             return row['status'] == "DELETED" or (
                 row['delete_timestamp'] > row['put_timestamp'])
 
+    def update_put_timestamp(self, timestamp):
+        """
+        Update the put_timestamp.  Only modifies it if it is greater than
+        the current timestamp.
+
+        :param timestamp: internalized put timestamp
+        :returns: a tuple of (was_deleted, is_deleted); whether the account
+                  was considered deleted before and after the update
+        """
+        self._commit_puts_stale_ok()
+        with self.get() as conn:
+            info = dict(conn.execute('''
+                SELECT put_timestamp, delete_timestamp, container_count, status
+                FROM account_stat''').fetchone())
+            was_deleted = self._is_deleted_info(**info)
+            conn.execute(
+                'UPDATE account_stat SET put_timestamp = ?'
+                ' WHERE put_timestamp < ?', (timestamp, timestamp))
+            conn.commit()
+        # mirror the update rather than reading the row back
+        info['put_timestamp'] = max(info['put_timestamp'], timestamp)
+        return was_deleted, self._is_deleted_info(**info)
+
     def get_policy_stats(self, do_migrations=False):
         """
         Get global policy stats for the account.
@@ -15,6 +15,7 @@
 
 from swift.account.backend import AccountBroker, DATADIR
 from swift.common import db_replicator
+from swift.common.db import config_db_pragmas
 
 
 class AccountReplicator(db_replicator.Replicator):
@@ -22,3 +23,7 @@ class AccountReplicator(db_replicator.Replicator):
     brokerclass = AccountBroker
     datadir = DATADIR
     default_port = 6202
+
+    def __init__(self, conf, logger=None):
+        super(AccountReplicator, self).__init__(conf, logger=logger)
+        config_db_pragmas(conf)
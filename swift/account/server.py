@@ -13,12 +13,18 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import functools
 import json
 import os
 import time
 import traceback
+import weakref
+from collections import OrderedDict
+from contextlib import contextmanager
 
-from eventlet import Timeout
+import eventlet.queue
+from eventlet import Timeout, spawn_n
+from eventlet.semaphore import Semaphore
 
 import swift.common.db
 from swift.account.backend import AccountBroker, DATADIR
@@ -41,8 +47,17 @@ from swift.common.swob import HTTPAccepted, HTTPBadRequest, \
     HTTPCreated, HTTPForbidden, HTTPInternalServerError, \
     HTTPMethodNotAllowed, HTTPNoContent, HTTPNotFound, \
     HTTPPreconditionFailed, HTTPConflict, Request, \
-    HTTPInsufficientStorage, HTTPException, wsgi_to_str
-from swift.common.request_helpers import is_sys_or_user_meta
+    HTTPInsufficientStorage, HTTPException, wsgi_to_str, \
+    header_to_environ_key, environ_key_to_header
+from swift.common.request_helpers import get_sys_meta_prefix, \
+    get_user_meta_prefix
+
+
+#: environ keys of headers that are persisted as account metadata start with
+#: one of these
+META_ENVIRON_PREFIXES = (
+    header_to_environ_key(get_user_meta_prefix('account')),
+    header_to_environ_key(get_sys_meta_prefix('account')))
 
 
 def get_account_name_and_placement(req):
@@ -71,10 +86,76 @@ def get_container_name_and_placement(req):
     return drive, part, account, container
 
 
+def get_head_params(req):
+    """
+    Get the request parameters used by an account HEAD.
+
+    :param req: a swob request
+    :returns: a dict of keyword arguments for the HEAD handler
+    """
+    return {'out_content_type': listing_formats.get_listing_content_type(req)}
+
+
+def get_listing_params(req):
+    """
+    Get the request parameters used by an account GET.
+
+    :param req: a swob request
+    :returns: a dict of keyword arguments for the GET handler
+    """
+    return {
+        'prefix': get_param(req, 'prefix'),
+        'delimiter': get_param(req, 'delimiter'),
+        'reverse': config_true_value(get_param(req, 'reverse')),
+        'limit': constrain_req_limit(req, constraints.ACCOUNT_LISTING_LIMIT),
+        'marker': get_param(req, 'marker', ''),
+        'end_marker': get_param(req, 'end_marker'),
+        'out_content_type': listing_formats.get_listing_content_type(req),
+    }
+
+
+def account_request(require_timestamp=False, get_params=None):
+    """
+    Decorator for account handlers that share the same request prelude.
+
+    The path is split and validated, then the X-Timestamp header is
+    validated if ``require_timestamp`` is set and any other request
+    parameters are gathered with ``get_params``. Only then is the drive
+    checked, so that a bad request is rejected as such even on an unusable
+    drive. The handler is called with the drive, partition and account (and
+    the request timestamp if it was required) as extra arguments, plus the
+    parameters as keyword arguments.
+
+    :param require_timestamp: if True, validate the request's X-Timestamp and
+                              pass it on to the handler
+    :param get_params: optional function that takes the request and returns
+                       a dict of keyword arguments for the handler
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapped(self, req):
+            drive, part, account = get_account_name_and_placement(req)
+            args = (drive, part, account)
+            if require_timestamp:
+                args += (valid_timestamp(req),)
+            kwargs = get_params(req) if get_params else {}
+            try:
+                self._check_drive(drive)
+            except ValueError:
+                return HTTPInsufficientStorage(drive=drive, request=req)
+            return func(self, req, *args, **kwargs)
+        return wrapped
+    return decorator
+
+
 class AccountController(BaseStorageServer):
     """WSGI controller for the account server."""
 
     server_type = 'account-server'
+    #: Max number of idle connections to keep for any one database
+    max_pooled_connections_per_db = 4
+    #: Max number of cached db paths before the cache is reset
+    max_db_path_cache_size = 4096
 
     def __init__(self, conf, logger=None):
         super(AccountController, self).__init__(conf)
@@ -101,17 +182,192 @@ class AccountController(BaseStorageServer):
             config_true_value(conf.get('db_preallocation', 'f'))
         swift.common.db.QUERY_LOGGING = \
             config_true_value(conf.get('db_query_logging', 'f'))
+        swift.common.db.config_db_pragmas(conf)
         self.fallocate_reserve, self.fallocate_is_percent = \
             config_fallocate_value(conf.get('fallocate_reserve', '1%'))
+        # db_file -> Semaphore; entries go away once no request holds them
+        self._write_locks = weakref.WeakValueDictionary()
+        self.db_connection_pool_size = int(
+            conf.get('db_connection_pool_size', 0))
+        # db_file -> (file_id, list of idle conns); least recently used first
+        self._read_pool = OrderedDict()
+        self._pooled_connection_count = 0
+        # (drive, part, account) -> db_file
+        self._db_path_cache = {}
+        self.mount_check_cache_ttl = float(
+            conf.get('mount_check_cache_ttl', 10))
+        # drive -> time it last passed check_drive
+        self._drive_checked = {}
+        # method name -> handler, for publicly accessible methods only; like
+        # allowed_methods, this is built on first use
+        self._handlers = None
+        self.log_queue_size = int(conf.get('log_queue_size', 0))
+        # created, along with the greenthread draining it, on first use so
+        # that nothing is spawned in a process that never serves requests
+        self._log_queue = None
+
+    def _log_request(self, log_func, log_msg):
+        """
+        Emit a request log line, either directly or, if ``log_queue_size`` is
+        set, by queueing it for a greenthread to write out so that a slow log
+        handler doesn't hold up the response. Lines that don't fit in a full
+        queue are dropped rather than waited on.
+
+        :param log_func: logger method to emit the line with
+        :param log_msg: the log line
+        """
+        if self.log_queue_size <= 0:
+            log_func(log_msg)
+            return
+        if self._log_queue is None:
+            self._log_queue = eventlet.queue.LightQueue(self.log_queue_size)
+            spawn_n(self._drain_log_queue, self._log_queue)
+        try:
+            self._log_queue.put_nowait((log_func, log_msg))
+        except eventlet.queue.Full:
+            self.logger.increment('log_queue.drops')
+
+    def _drain_log_queue(self, log_queue):
+        while True:
+            log_func, log_msg = log_queue.get()
+            try:
+                log_func(log_msg)
+            except Exception:
+                # this is the only greenthread draining the queue; don't let
+                # one bad line stop every later one from being written
+                self.logger.exception('ERROR writing queued log line')
+
+    def _writer_lock(self, db_file):
+        """
+        Returns a lock that serializes this worker's writes to ``db_file``,
+        so concurrent requests queue up here rather than retrying on SQLite's
+        "database is locked" errors. Reads are not serialized.
+
+        :param db_file: path to the database file
+        """
+        return self._write_locks.setdefault(db_file, Semaphore(1))
+
+    def _check_drive(self, drive):
+        """
+        Check the drive with :func:`~swift.common.constraints.check_drive`,
+        skipping the check if the drive already passed it within the last
+        ``mount_check_cache_ttl`` seconds. Failures are never cached, so a
+        drive that goes away is noticed as soon as its cached result expires.
+
+        :param drive: drive name to be checked
+        :raises ValueError: if drive fails to validate
+        """
+        if self.mount_check_cache_ttl <= 0:
+            check_drive(self.root, drive, self.mount_check)
+            return
+        now = time.time()
+        checked = self._drive_checked.get(drive)
+        if checked is not None and now - checked < self.mount_check_cache_ttl:
+            return
+        self._drive_checked.pop(drive, None)
+        check_drive(self.root, drive, self.mount_check)
+        self._drive_checked[drive] = now
+
+    def _get_db_path(self, drive, part, account):
+        key = (drive, part, account)
+        db_path = self._db_path_cache.get(key)
+        if db_path is None:
+            hsh = hash_path(account)
+            db_dir = storage_directory(DATADIR, part, hsh)
+            db_path = os.path.join(self.root, drive, db_dir, hsh + '.db')
+            if len(self._db_path_cache) >= self.max_db_path_cache_size:
+                self._db_path_cache.clear()
+            self._db_path_cache[key] = db_path
+        return db_path
 
     def _get_account_broker(self, drive, part, account, **kwargs):
-        hsh = hash_path(account)
-        db_dir = storage_directory(DATADIR, part, hsh)
-        db_path = os.path.join(self.root, drive, db_dir, hsh + '.db')
+        db_path = self._get_db_path(drive, part, account)
         kwargs.setdefault('account', account)
         kwargs.setdefault('logger', self.logger)
         return AccountBroker(db_path, **kwargs)
 
+    @contextmanager
+    def _pooled_account_broker(self, drive, part, account, **kwargs):
+        """
+        Use with the "with" statement; returns an account broker whose
+        connection is taken from, and afterwards returned to, a pool of idle
+        connections kept per database file. This saves re-opening the
+        database on every read request.
+        """
+        broker = self._get_account_broker(drive, part, account, **kwargs)
+        if self.db_connection_pool_size <= 0:
+            yield broker
+            return
+        try:
+            st = os.stat(broker.db_file)
+        except OSError:
+            # no db (yet); nothing worth pooling
+            yield broker
+            return
+        # a pooled connection must not outlive the file it was opened on,
+        # e.g. when replication renames a new db into place
+        file_id = (st.st_dev, st.st_ino)
+        broker.conn = self._checkout_db_connection(broker.db_file, file_id)
+        if broker.conn:
+            broker.conn.timeout = broker.timeout
+        try:
+            yield broker
+        finally:
+            # broker.get() drops the connection if it hit an error
+            conn, broker.conn = broker.conn, None
+            if conn:
+                self._checkin_db_connection(broker.db_file, file_id, conn)
+
+    def _checkout_db_connection(self, db_file, file_id):
+        pooled_file_id, conns = self._read_pool.get(db_file, (None, None))
+        if not conns:
+            return None
+        if pooled_file_id != file_id:
+            self._drop_db_connections(db_file)
+            return None
+        conn = conns.pop()
+        self._pooled_connection_count -= 1
+        if not conns:
+            del self._read_pool[db_file]
+        return conn
+
+    def _checkin_db_connection(self, db_file, file_id, conn):
+        try:
+            st = os.stat(db_file)
+        except OSError:
+            st = None
+        if not st or (st.st_dev, st.st_ino) != file_id:
+            # the db was replaced or removed while this conn was in use
+            conn.close()
+            self._drop_db_connections(db_file)
+            return
+        pooled_file_id, conns = self._read_pool.get(db_file, (file_id, []))
+        if pooled_file_id != file_id:
+            self._drop_db_connections(db_file)
+            conns = []
+        if len(conns) < self.max_pooled_connections_per_db:
+            conns.append(conn)
+            self._pooled_connection_count += 1
+        else:
+            conn.close()
+        # re-insert to mark this db as most recently used
+        self._read_pool.pop(db_file, None)
+        if conns:
+            self._read_pool[db_file] = (file_id, conns)
+        while self._pooled_connection_count > self.db_connection_pool_size:
+            lru_db_file = next(iter(self._read_pool))
+            lru_conns = self._read_pool[lru_db_file][1]
+            lru_conns.pop(0).close()
+            self._pooled_connection_count -= 1
+            if not lru_conns:
+                del self._read_pool[lru_db_file]
+
+    def _drop_db_connections(self, db_file):
+        _junk, conns = self._read_pool.pop(db_file, (None, []))
+        for conn in conns:
+            conn.close()
+        self._pooled_connection_count -= len(conns)
+
     def _deleted_response(self, broker, req, resp, body=''):
         # We are here since either the account does not exist or
         # it exists but marked for deletion.
@@ -133,25 +389,27 @@ class AccountController(BaseStorageServer):
 
     @public
     @timing_stats()
-    def DELETE(self, req):
+    @account_request()
+    def DELETE(self, req, drive, part, account):
         """Handle HTTP DELETE request."""
-        drive, part, account = get_account_name_and_placement(req)
-        try:
-            check_drive(self.root, drive, self.mount_check)
-        except ValueError:
-            return HTTPInsufficientStorage(drive=drive, request=req)
         req_timestamp = valid_timestamp(req)
         broker = self._get_account_broker(drive, part, account)
-        if broker.is_deleted():
-            return self._deleted_response(broker, req, HTTPNotFound)
-        broker.delete_db(req_timestamp.internal)
+        with self._writer_lock(broker.db_file):
+            if broker.is_deleted():
+                return self._deleted_response(broker, req, HTTPNotFound)
+            broker.delete_db(req_timestamp.internal)
         return self._deleted_response(broker, req, HTTPNoContent)
 
     def _update_metadata(self, req, broker, req_timestamp):
-        metadata = {
-            wsgi_to_str(key): (wsgi_to_str(value), req_timestamp.internal)
-            for key, value in req.headers.items()
-            if is_sys_or_user_meta('account', key)}
+        # scan the environ directly; req.headers would build a header name
+        # for every key in the environ only for most to be thrown away
+        metadata = {}
+        timestamp = req_timestamp.internal
+        for env_key, value in req.environ.items():
+            if env_key.startswith(META_ENVIRON_PREFIXES) and \
+                    env_key not in META_ENVIRON_PREFIXES:
+                metadata[wsgi_to_str(environ_key_to_header(env_key))] = (
+                    wsgi_to_str(value), timestamp)
         if metadata:
             broker.update_metadata(metadata, validate_metadata=True)
 
@@ -161,7 +419,7 @@ class AccountController(BaseStorageServer):
         """Handle HTTP PUT request."""
         drive, part, account, container = get_container_name_and_placement(req)
         try:
-            check_drive(self.root, drive, self.mount_check)
+            self._check_drive(drive)
         except ValueError:
             return HTTPInsufficientStorage(drive=drive, request=req)
         if not self.check_free_space(drive):
@@ -171,51 +429,65 @@ class AccountController(BaseStorageServer):
                 timestamp = Timestamp.now()
             else:
                 timestamp = valid_timestamp(req)
-            pending_timeout = None
+            # each header is looked up once; every lookup has to translate
+            # the header name into its environ key
+            headers = req.headers
             container_policy_index = \
-                req.headers.get('X-Backend-Storage-Policy-Index', 0)
-            if 'x-trans-id' in req.headers:
+                headers.get('X-Backend-Storage-Policy-Index', 0)
+            override_deleted = headers.get(
+                'x-account-override-deleted', 'no').lower() == 'yes'
+            pending_timeout = None
+            if 'x-trans-id' in headers:
                 pending_timeout = 3
             broker = self._get_account_broker(drive, part, account,
                                               pending_timeout=pending_timeout)
-            if account.startswith(self.auto_create_account_prefix) and \
-                    not os.path.exists(broker.db_file):
-                try:
-                    broker.initialize(timestamp.internal)
-                except DatabaseAlreadyExists:
-                    pass
-            if (req.headers.get('x-account-override-deleted', 'no').lower() !=
-                    'yes' and broker.is_deleted()) \
-                    or not os.path.exists(broker.db_file):
-                return HTTPNotFound(request=req)
-            broker.put_container(container, req.headers['x-put-timestamp'],
-                                 req.headers['x-delete-timestamp'],
-                                 req.headers['x-object-count'],
-                                 req.headers['x-bytes-used'],
-                                 container_policy_index)
-            if req.headers['x-delete-timestamp'] > \
-                    req.headers['x-put-timestamp']:
+            with self._writer_lock(broker.db_file):
+                auto_created = False
+                if account.startswith(self.auto_create_account_prefix) and \
+                        not os.path.exists(broker.db_file):
+                    try:
+                        broker.initialize(timestamp.internal)
+                    except DatabaseAlreadyExists:
+                        pass
+                    auto_created = True
+                # is_deleted() already treats a missing db as deleted, so
+                # only stat the db here when that check is skipped
+                if override_deleted:
+                    if not auto_created and \
+                            not os.path.exists(broker.db_file):
+                        return HTTPNotFound(request=req)
+                elif broker.is_deleted():
+                    return HTTPNotFound(request=req)
+                put_timestamp = headers['x-put-timestamp']
+                delete_timestamp = headers['x-delete-timestamp']
+                object_count = headers['x-object-count']
+                bytes_used = headers['x-bytes-used']
+                broker.put_container(container, put_timestamp,
+                                     delete_timestamp, object_count,
+                                     bytes_used, container_policy_index)
+            if delete_timestamp > put_timestamp:
                 return HTTPNoContent(request=req)
             else:
                 return HTTPCreated(request=req)
         else:   # put account
             timestamp = valid_timestamp(req)
             broker = self._get_account_broker(drive, part, account)
-            if not os.path.exists(broker.db_file):
-                try:
-                    broker.initialize(timestamp.internal)
-                    created = True
-                except DatabaseAlreadyExists:
-                    created = False
-            elif broker.is_status_deleted():
-                return self._deleted_response(broker, req, HTTPForbidden,
-                                              body='Recently deleted')
-            else:
-                created = broker.is_deleted()
-                broker.update_put_timestamp(timestamp.internal)
-                if broker.is_deleted():
-                    return HTTPConflict(request=req)
-            self._update_metadata(req, broker, timestamp)
+            with self._writer_lock(broker.db_file):
+                if not os.path.exists(broker.db_file):
+                    try:
+                        broker.initialize(timestamp.internal)
+                        created = True
+                    except DatabaseAlreadyExists:
+                        created = False
+                elif broker.is_status_deleted():
+                    return self._deleted_response(broker, req, HTTPForbidden,
+                                                  body='Recently deleted')
+                else:
+                    created, deleted = broker.update_put_timestamp(
+                        timestamp.internal)
+                    if deleted:
+                        return HTTPConflict(request=req)
+                self._update_metadata(req, broker, timestamp)
             if created:
                 return HTTPCreated(request=req)
             else:
@@ -223,48 +495,32 @@ class AccountController(BaseStorageServer):
 
     @public
     @timing_stats()
-    def HEAD(self, req):
+    @account_request(get_params=get_head_params)
+    def HEAD(self, req, drive, part, account, out_content_type):
         """Handle HTTP HEAD request."""
-        drive, part, account = get_account_name_and_placement(req)
-        out_content_type = listing_formats.get_listing_content_type(req)
-        try:
-            check_drive(self.root, drive, self.mount_check)
-        except ValueError:
-            return HTTPInsufficientStorage(drive=drive, request=req)
-        broker = self._get_account_broker(drive, part, account,
-                                          pending_timeout=0.1,
-                                          stale_reads_ok=True)
-        if broker.is_deleted():
-            return self._deleted_response(broker, req, HTTPNotFound)
-        headers = get_response_headers(broker)
+        with self._pooled_account_broker(drive, part, account,
+                                         pending_timeout=0.1,
+                                         stale_reads_ok=True) as broker:
+            if broker.is_deleted():
+                return self._deleted_response(broker, req, HTTPNotFound)
+            headers = get_response_headers(broker)
         headers['Content-Type'] = out_content_type
         return HTTPNoContent(request=req, headers=headers, charset='utf-8')
 
     @public
     @timing_stats()
-    def GET(self, req):
+    @account_request(get_params=get_listing_params)
+    def GET(self, req, drive, part, account, prefix, delimiter, reverse,
+            limit, marker, end_marker, out_content_type):
         """Handle HTTP GET request."""
-        drive, part, account = get_account_name_and_placement(req)
-        prefix = get_param(req, 'prefix')
-        delimiter = get_param(req, 'delimiter')
-        reverse = config_true_value(get_param(req, 'reverse'))
-        limit = constrain_req_limit(req, constraints.ACCOUNT_LISTING_LIMIT)
-        marker = get_param(req, 'marker', '')
-        end_marker = get_param(req, 'end_marker')
-        out_content_type = listing_formats.get_listing_content_type(req)
-
-        try:
-            check_drive(self.root, drive, self.mount_check)
-        except ValueError:
-            return HTTPInsufficientStorage(drive=drive, request=req)
-        broker = self._get_account_broker(drive, part, account,
-                                          pending_timeout=0.1,
-                                          stale_reads_ok=True)
-        if broker.is_deleted():
-            return self._deleted_response(broker, req, HTTPNotFound)
-        return account_listing_response(account, req, out_content_type, broker,
-                                        limit, marker, end_marker, prefix,
-                                        delimiter, reverse)
+        with self._pooled_account_broker(drive, part, account,
+                                         pending_timeout=0.1,
+                                         stale_reads_ok=True) as broker:
+            if broker.is_deleted():
+                return self._deleted_response(broker, req, HTTPNotFound)
+            return account_listing_response(account, req, out_content_type,
+                                            broker, limit, marker, end_marker,
+                                            prefix, delimiter, reverse)
 
     @public
     @replication
@@ -277,7 +533,7 @@ class AccountController(BaseStorageServer):
         post_args = split_and_validate_path(req, 3)
         drive, partition, hash = post_args
         try:
-            check_drive(self.root, drive, self.mount_check)
+            self._check_drive(drive)
         except ValueError:
             return HTTPInsufficientStorage(drive=drive, request=req)
         if not self.check_free_space(drive):
@@ -292,20 +548,16 @@ class AccountController(BaseStorageServer):
 
     @public
     @timing_stats()
-    def POST(self, req):
+    @account_request(require_timestamp=True)
+    def POST(self, req, drive, part, account, req_timestamp):
         """Handle HTTP POST request."""
-        drive, part, account = get_account_name_and_placement(req)
-        req_timestamp = valid_timestamp(req)
-        try:
-            check_drive(self.root, drive, self.mount_check)
-        except ValueError:
-            return HTTPInsufficientStorage(drive=drive, request=req)
         if not self.check_free_space(drive):
             return HTTPInsufficientStorage(drive=drive, request=req)
         broker = self._get_account_broker(drive, part, account)
-        if broker.is_deleted():
-            return self._deleted_response(broker, req, HTTPNotFound)
-        self._update_metadata(req, broker, req_timestamp)
+        with self._writer_lock(broker.db_file):
+            if broker.is_deleted():
+                return self._deleted_response(broker, req, HTTPNotFound)
+            self._update_metadata(req, broker, req_timestamp)
         return HTTPNoContent(request=req)
 
     def __call__(self, env, start_response):
@@ -317,10 +569,14 @@ class AccountController(BaseStorageServer):
         else:
             try:
                 # disallow methods which are not publicly accessible
-                if req.method not in self.allowed_methods:
+                if self._handlers is None:
+                    self._handlers = {name: getattr(self, name)
+                                      for name in self.allowed_methods}
+                handler = self._handlers.get(req.method)
+                if handler is None:
                     res = HTTPMethodNotAllowed()
                 else:
-                    res = getattr(self, req.method)(req)
+                    res = handler(req)
             except HTTPException as error_response:
                 res = error_response
             except (Exception, Timeout):
@@ -338,9 +594,9 @@ class AccountController(BaseStorageServer):
                                    self.log_format, self.anonymization_method,
                                    self.anonymization_salt)
             if req.method.upper() == 'REPLICATE':
-                self.logger.debug(log_msg)
+                self._log_request(self.logger.debug, log_msg)
             else:
-                self.logger.info(log_msg)
+                self._log_request(self.logger.info, log_msg)
         return res(env, start_response)
 
 
@@ -364,14 +364,24 @@ def check_utf8(string, internal=False):
     if not string:
         return False
     try:
+        # Most strings are pure ASCII, which is always valid UTF-8 and cannot
+        # contain surrogates; for those, decoded stays None and the
+        # per-codepoint surrogate check below is skipped.
+        decoded = None
         if isinstance(string, six.text_type):
-            encoded = string.encode('utf-8')
-            decoded = string
+            try:
+                encoded = string.encode('ascii')
+            except UnicodeEncodeError:
+                encoded = string.encode('utf-8')
+                decoded = string
         else:
             encoded = string
-            decoded = string.decode('UTF-8')
-            if decoded.encode('UTF-8') != encoded:
-                return False
+            try:
+                string.decode('ascii')
+            except UnicodeDecodeError:
+                decoded = string.decode('UTF-8')
+                if decoded.encode('UTF-8') != encoded:
+                    return False
         # A UTF-8 string with surrogates in it is invalid.
         #
         # Note: this check is only useful on Python 2. On Python 3, a
@@ -385,8 +395,8 @@ def check_utf8(string, internal=False):
         # b'\xf0\x9f\xa6\xa0', it will not pass this check. Fortunately,
         # most Linux distributions build Python 2 wide, and Python 3.3+
         # removed the wide/narrow distinction entirely.
-        if any(0xD800 <= ord(codepoint) <= 0xDFFF
-               for codepoint in decoded):
+        if decoded is not None and any(0xD800 <= ord(codepoint) <= 0xDFFF
+                                       for codepoint in decoded):
             return False
         if b'\x00' != utils.RESERVED_BYTE and b'\x00' in encoded:
             return False
@@ -43,6 +43,11 @@ from swift.common.swob import HTTPBadRequest
 DB_PREALLOCATION = False
 #: Whether calls will be made to log queries (py3 only)
 QUERY_LOGGING = False
+#: SQLite synchronous setting used for database connections
+DB_SYNCHRONOUS = 'NORMAL'
+#: SQLite page cache size (in KiB) for database connections; None leaves the
+# SQLite default in place
+DB_CACHE_SIZE = None
 #: Timeout for trying to connect to a DB
 BROKER_TIMEOUT = 25
 #: Pickle protocol to use
@@ -54,6 +59,8 @@ PENDING_CAP = 131072
 SQLITE_ARG_LIMIT = 999
 RECLAIM_PAGE_SIZE = 10000
 
+SYNCHRONOUS_MODES = ('OFF', 'NORMAL', 'FULL')
+
 
 def utf8encode(*args):
     return [(s.encode('utf8') if isinstance(s, six.text_type) else s)
@@ -91,17 +98,50 @@ def zero_like(count):
     return count in ZERO_LIKE_VALUES
 
 
+def config_db_pragmas(conf):
+    """
+    Set the module-level SQLite PRAGMA options used by
+    :func:`get_db_connection` from a daemon's config.
+
+    :param conf: a config dict
+    :raises ValueError: if any of the options is invalid
+    """
+    global DB_SYNCHRONOUS, DB_CACHE_SIZE
+    synchronous = conf.get('db_synchronous', 'normal').upper()
+    if synchronous not in SYNCHRONOUS_MODES:
+        raise ValueError('db_synchronous must be one of %s, not %r' % (
+            ', '.join(m.lower() for m in SYNCHRONOUS_MODES),
+            conf['db_synchronous']))
+    cache_size = conf.get('db_cache_size')
+    if cache_size:
+        cache_size = int(cache_size)
+        if cache_size <= 0:
+            raise ValueError('db_cache_size must be a positive integer')
+    else:
+        cache_size = None
+    DB_SYNCHRONOUS = synchronous
+    DB_CACHE_SIZE = cache_size
+
+
 def _db_timeout(timeout, db_file, call):
+    # connections are opened with no busy timeout, so the call never blocks
+    # and the timeout could only ever fire while sleeping between retries;
+    # don't schedule it unless the first attempt finds the db locked
+    try:
+        return call()
+    except sqlite3.OperationalError as e:
+        if 'locked' not in str(e):
+            raise
     with LockTimeout(timeout, db_file):
         retry_wait = 0.001
         while True:
+            sleep(retry_wait)
+            retry_wait = min(retry_wait * 2, 0.05)
             try:
                 return call()
             except sqlite3.OperationalError as e:
                 if 'locked' not in str(e):
                     raise
-            sleep(retry_wait)
-            retry_wait = min(retry_wait * 2, 0.05)
 
 
 class DatabaseConnectionError(sqlite3.DatabaseError):
@@ -230,10 +270,13 @@ def get_db_connection(path, timeout=30, logger=None, okay_to_create=False):
         conn.row_factory = sqlite3.Row
         conn.text_factory = str
         with closing(conn.cursor()) as cur:
-            cur.execute('PRAGMA synchronous = NORMAL')
+            cur.execute('PRAGMA synchronous = %s' % DB_SYNCHRONOUS)
             cur.execute('PRAGMA count_changes = OFF')
             cur.execute('PRAGMA temp_store = MEMORY')
             cur.execute('PRAGMA journal_mode = DELETE')
+            if DB_CACHE_SIZE:
+                # negative values are interpreted by SQLite as KiB
+                cur.execute('PRAGMA cache_size = -%d' % DB_CACHE_SIZE)
         conn.create_function('chexor', 3, chexor)
     except sqlite3.DatabaseError:
         import traceback
@@ -29,6 +29,10 @@ from swift.common.utils import RESERVED, get_logger, list_from_csv
 #: content-type values.
 FORMAT2CONTENT_TYPE = {'plain': 'text/plain', 'json': 'application/json',
                        'xml': 'application/xml'}
+#: Content-types an account or container listing can be rendered as, in
+#: order of preference.
+LISTING_CONTENT_TYPES = ['text/plain', 'application/json', 'application/xml',
+                         'text/xml']
 #: Maximum size of a valid JSON container listing body. If we receive
 #: a container listing response larger than this, assume it's a staticweb
 #: response and pass it on to the client.
@@ -50,11 +54,16 @@ def get_listing_content_type(req):
     """
     query_format = get_param(req, 'format')
     if query_format:
-        req.accept = FORMAT2CONTENT_TYPE.get(
+        # every format maps to one of the listing content types, so there's
+        # no need to go through Accept header matching
+        out_content_type = FORMAT2CONTENT_TYPE.get(
             query_format.lower(), FORMAT2CONTENT_TYPE['plain'])
+        req.accept = out_content_type
+        return out_content_type
+    if not req.headers.get('Accept'):
+        return LISTING_CONTENT_TYPES[0]
     try:
-        out_content_type = req.accept.best_match(
-            ['text/plain', 'application/json', 'application/xml', 'text/xml'])
+        out_content_type = req.accept.best_match(LISTING_CONTENT_TYPES)
     except ValueError:
         raise HTTPBadRequest(request=req, body=b'Invalid Accept header')
     if not out_content_type:
@@ -227,6 +227,16 @@ def header_to_environ_key(header_name):
     return header_name
 
 
+def environ_key_to_header(environ_key):
+    """
+    The inverse of :func:`header_to_environ_key` for ``HTTP_*`` environ keys,
+    e.g. ``HTTP_X_ACCOUNT_META_FOO`` becomes ``X-Account-Meta-Foo``.
+    """
+    # See the to/from WSGI comment in header_to_environ_key
+    return bytes_to_wsgi(
+        wsgi_to_bytes(environ_key[5:]).replace(b'_', b'-').title())
+
+
 class HeaderEnvironProxy(MutableMapping):
     """
     A dict-like object that proxies requests to a wsgi environ,
@@ -265,10 +275,8 @@ class HeaderEnvironProxy(MutableMapping):
         del self.environ[header_to_environ_key(key)]
 
     def keys(self):
-        # See the to/from WSGI comment in header_to_environ_key
-        keys = [
-            bytes_to_wsgi(wsgi_to_bytes(key[5:]).replace(b'_', b'-').title())
-            for key in self.environ if key.startswith('HTTP_')]
+        keys = [environ_key_to_header(key)
+                for key in self.environ if key.startswith('HTTP_')]
         if 'CONTENT_LENGTH' in self.environ:
             keys.append('Content-Length')
         if 'CONTENT_TYPE' in self.environ:
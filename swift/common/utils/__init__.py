@@ -567,6 +567,11 @@ class StrFormatTime(object):
     Class that permits to get formats or parts of a time.
     """
 
+    # (time_struct, {directive: formatted value}) for the most recently
+    # formatted second; log lines are mostly made for the current second, so
+    # this saves a datetime and a strftime for every directive in every line
+    _strftime_cache = (None, {})
+
     def __init__(self, ts):
         self.time = ts
         self.time_struct = time.gmtime(ts)
@@ -580,8 +585,16 @@ class StrFormatTime(object):
                         'w', 'W', 'x', 'X', 'y', 'Y', 'Z']:
             raise ValueError(("The attribute %s is not a correct directive "
                               "for time.strftime formater.") % attr)
-        return datetime.datetime(*self.time_struct[:-2],
-                                 tzinfo=UTC).strftime('%' + attr)
+        cached_struct, formatted = StrFormatTime._strftime_cache
+        if cached_struct != self.time_struct:
+            formatted = {}
+            StrFormatTime._strftime_cache = (self.time_struct, formatted)
+        try:
+            return formatted[attr]
+        except KeyError:
+            value = formatted[attr] = datetime.datetime(
+                *self.time_struct[:-2], tzinfo=UTC).strftime('%' + attr)
+            return value
 
     @property
     def asctime(self):
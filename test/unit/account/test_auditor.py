@@ -20,6 +20,9 @@ import time
 import os
 import random
 
+import mock
+
+import swift.common.db
 from swift.account import auditor
 from swift.common.storage_policy import POLICIES
 from swift.common.utils import Timestamp
@@ -78,6 +81,18 @@ class TestAuditorRealBroker(unittest.TestCase):
     def setUp(self):
         self.logger = debug_logger()
 
+    def test_db_pragmas_conf(self):
+        with mock.patch.multiple(swift.common.db, DB_SYNCHRONOUS='NORMAL',
+                                 DB_CACHE_SIZE=None):
+            auditor.AccountAuditor({'db_synchronous': 'full',
+                                    'db_cache_size': '4000'},
+                                   logger=self.logger)
+            self.assertEqual('FULL', swift.common.db.DB_SYNCHRONOUS)
+            self.assertEqual(4000, swift.common.db.DB_CACHE_SIZE)
+        with self.assertRaises(ValueError):
+            auditor.AccountAuditor({'db_synchronous': 'extra'},
+                                   logger=self.logger)
+
     @with_tempdir
     def test_db_validate_fails(self, tempdir):
         ts = (Timestamp(t).internal for t in itertools.count(int(time.time())))
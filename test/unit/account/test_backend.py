@@ -124,6 +124,38 @@ class TestAccountBroker(test_db.TestDbBase):
             Timestamp(time() + 999).internal)
         self.assertTrue(broker2.is_status_deleted())
 
+    def test_update_put_timestamp(self):
+        ts_iter = make_timestamp_iter()
+        broker = AccountBroker(self.get_db_path(), account='a')
+        broker.initialize(next(ts_iter).internal)
+        put_timestamp = next(ts_iter).internal
+        self.assertEqual((False, False),
+                         broker.update_put_timestamp(put_timestamp))
+        self.assertEqual(put_timestamp, broker.get_info()['put_timestamp'])
+        # older timestamps don't move it back
+        self.assertEqual((False, False),
+                         broker.update_put_timestamp(Timestamp(1).internal))
+        self.assertEqual(put_timestamp, broker.get_info()['put_timestamp'])
+
+        # deleted by timestamp, revived by a newer put
+        broker.merge_timestamps(next(ts_iter).internal, put_timestamp,
+                                next(ts_iter).internal)
+        self.assertTrue(broker.is_deleted())
+        self.assertEqual((True, True),
+                         broker.update_put_timestamp(put_timestamp))
+        self.assertTrue(broker.is_deleted())
+        put_timestamp = next(ts_iter).internal
+        self.assertEqual((True, False),
+                         broker.update_put_timestamp(put_timestamp))
+        self.assertFalse(broker.is_deleted())
+        self.assertEqual(put_timestamp, broker.get_info()['put_timestamp'])
+
+        # once the status is DELETED a newer put doesn't revive it
+        broker.delete_db(next(ts_iter).internal)
+        self.assertEqual((True, True),
+                         broker.update_put_timestamp(next(ts_iter).internal))
+        self.assertTrue(broker.is_deleted())
+
     def test_reclaim(self):
         broker = AccountBroker(self.get_db_path(), account='test_account')
         broker.initialize(Timestamp('1').internal)
@@ -23,6 +23,8 @@ import unittest
 from mock import patch, call, DEFAULT
 import eventlet
 
+import swift.common.db
+
 from swift.account import reaper
 from swift.account.backend import DATADIR
 from swift.common.exceptions import ClientException
@@ -237,6 +239,16 @@ class TestReaper(unittest.TestCase):
         self.assertRaises(ValueError, reaper.AccountReaper,
                           {'delay_reaping': 'abc'})
 
+    def test_db_pragmas_conf(self):
+        with patch.multiple(swift.common.db, DB_SYNCHRONOUS='NORMAL',
+                            DB_CACHE_SIZE=None):
+            reaper.AccountReaper({'db_synchronous': 'full',
+                                  'db_cache_size': '4000'})
+            self.assertEqual('FULL', swift.common.db.DB_SYNCHRONOUS)
+            self.assertEqual(4000, swift.common.db.DB_CACHE_SIZE)
+        self.assertRaises(ValueError, reaper.AccountReaper,
+                          {'db_synchronous': 'extra'})
+
     def test_reap_warn_after_conf_set(self):
         conf = {'delay_reaping': '2', 'reap_warn_after': '3'}
         r = reaper.AccountReaper(conf)
@@ -18,6 +18,9 @@ import time
 import unittest
 import shutil
 
+import mock
+
+import swift.common.db
 from swift.account import replicator, backend, server
 from swift.common.utils import normalize_timestamp
 from swift.common.storage_policy import POLICIES
@@ -31,6 +34,16 @@ class TestReplicatorSync(test_db_replicator.TestReplicatorSync):
     datadir = server.DATADIR
     replicator_daemon = replicator.AccountReplicator
 
+    def test_db_pragmas_conf(self):
+        with mock.patch.multiple(swift.common.db, DB_SYNCHRONOUS='NORMAL',
+                                 DB_CACHE_SIZE=None):
+            replicator.AccountReplicator({'db_synchronous': 'full',
+                                          'db_cache_size': '4000'})
+            self.assertEqual('FULL', swift.common.db.DB_SYNCHRONOUS)
+            self.assertEqual(4000, swift.common.db.DB_CACHE_SIZE)
+        with self.assertRaises(ValueError):
+            replicator.AccountReplicator({'db_synchronous': 'extra'})
+
     def test_sync(self):
         broker = self._get_broker('a', node_index=0)
         put_timestamp = normalize_timestamp(time.time())
@@ -14,6 +14,7 @@
 # limitations under the License.
 
 import errno
+import eventlet
 import os
 import mock
 import posix
@@ -29,13 +30,15 @@ from six import StringIO
 from six.moves.urllib.parse import quote
 import xml.dom.minidom
 
+import swift.common.db
 from swift import __version__ as swift_version
 from swift.common.swob import (Request, WsgiBytesIO, HTTPNoContent)
 from swift.common.constraints import ACCOUNT_LISTING_LIMIT
 from swift.account.backend import AccountBroker
 from swift.account.server import AccountController
 from swift.common.utils import (normalize_timestamp, replication, public,
-                                mkdirs, storage_directory, Timestamp)
+                                mkdirs, storage_directory, Timestamp,
+                                hash_path)
 from swift.common.request_helpers import get_sys_meta_prefix, get_reserved_name
 from test.debug_logger import debug_logger
 from test.unit import patch_policies, mock_check_drive, make_timestamp_iter
@@ -80,6 +83,23 @@ class TestAccountController(unittest.TestCase):
             'will be ignored in a future release.'
         ])
 
+    def test_init_db_pragmas(self):
+        conf = {
+            'devices': self.testdir,
+            'mount_check': 'false',
+            'db_synchronous': 'full',
+            'db_cache_size': '4000',
+        }
+        with mock.patch.multiple('swift.common.db', DB_SYNCHRONOUS='NORMAL',
+                                 DB_CACHE_SIZE=None):
+            AccountController(conf, logger=self.logger)
+            self.assertEqual('FULL', swift.common.db.DB_SYNCHRONOUS)
+            self.assertEqual(4000, swift.common.db.DB_CACHE_SIZE)
+
+        conf['db_synchronous'] = 'extra'
+        with self.assertRaises(ValueError):
+            AccountController(conf, logger=self.logger)
+
     def test_OPTIONS(self):
         server_handler = AccountController(
             {'devices': self.testdir, 'mount_check': 'false'})
@@ -94,7 +114,8 @@ class TestAccountController(unittest.TestCase):
                          (server_handler.server_type + '/' + swift_version))
 
     def test_insufficient_storage_mount_check_true(self):
-        conf = {'devices': self.testdir, 'mount_check': 'true'}
+        conf = {'devices': self.testdir, 'mount_check': 'true',
+                'mount_check_cache_ttl': '0'}
         account_controller = AccountController(conf)
         self.assertTrue(account_controller.mount_check)
         for method in account_controller.allowed_methods:
@@ -116,7 +137,8 @@ class TestAccountController(unittest.TestCase):
                     self.fail('%s for %s' % (e, method))
 
     def test_insufficient_storage_mount_check_false(self):
-        conf = {'devices': self.testdir, 'mount_check': 'false'}
+        conf = {'devices': self.testdir, 'mount_check': 'false',
+                'mount_check_cache_ttl': '0'}
         account_controller = AccountController(conf)
         self.assertFalse(account_controller.mount_check)
         for method in account_controller.allowed_methods:
@@ -137,6 +159,44 @@ class TestAccountController(unittest.TestCase):
                 except AssertionError as e:
                     self.fail('%s for %s' % (e, method))
 
+    def test_mount_check_cache(self):
+        conf = {'devices': self.testdir, 'mount_check': 'true'}
+        account_controller = AccountController(conf)
+        self.assertEqual(10, account_controller.mount_check_cache_ttl)
+        req = Request.blank('/sda1/p/a', method='HEAD')
+        with mock_check_drive() as mocks, \
+                mock.patch('time.time', return_value=1000.0):
+            resp = req.get_response(account_controller)
+            self.assertEqual(resp.status_int, 507)
+            # failures are not cached
+            mocks['ismount'].return_value = True
+            resp = req.get_response(account_controller)
+            self.assertEqual(resp.status_int, 404)
+            self.assertEqual(2, mocks['ismount'].call_count)
+            # but success is
+            mocks['ismount'].return_value = False
+            resp = req.get_response(account_controller)
+            self.assertEqual(resp.status_int, 404)
+            self.assertEqual(2, mocks['ismount'].call_count)
+        # until it expires
+        with mock_check_drive() as mocks, \
+                mock.patch('time.time', return_value=1010.0):
+            resp = req.get_response(account_controller)
+            self.assertEqual(resp.status_int, 507)
+            self.assertEqual(1, mocks['ismount'].call_count)
+
+    def test_mount_check_cache_disabled(self):
+        conf = {'devices': self.testdir, 'mount_check': 'true',
+                'mount_check_cache_ttl': '0'}
+        account_controller = AccountController(conf)
+        req = Request.blank('/sda1/p/a', method='HEAD')
+        with mock_check_drive(ismount=True) as mocks:
+            for _ in range(3):
+                resp = req.get_response(account_controller)
+                self.assertEqual(resp.status_int, 404)
+        self.assertEqual(3, mocks['ismount'].call_count)
+        self.assertFalse(account_controller._drive_checked)
+
     def test_DELETE_not_found(self):
         req = Request.blank('/sda1/p/a', environ={'REQUEST_METHOD': 'DELETE',
                                                   'HTTP_X_TIMESTAMP': '0'})
@@ -427,6 +487,70 @@ class TestAccountController(unittest.TestCase):
         self.assertEqual(resp.status_int, 404)
         self.assertNotIn('X-Account-Status', resp.headers)
 
+    def test_PUT_container_missing_headers(self):
+        self._put_account('a')
+        self._put_account('deleted')
+        req = Request.blank(
+            '/sda1/p/deleted', environ={'REQUEST_METHOD': 'DELETE'},
+            headers={'X-Timestamp': next(self.ts).internal})
+        self.assertEqual(204, req.get_response(self.controller).status_int)
+        headers = {'X-PUT-Timestamp': normalize_timestamp(1),
+                   'X-DELETE-Timestamp': normalize_timestamp(0),
+                   'X-Object-Count': '1',
+                   'X-Bytes-Used': '1',
+                   'X-Timestamp': normalize_timestamp(0)}
+        for missing in ('X-PUT-Timestamp', 'X-DELETE-Timestamp',
+                        'X-Object-Count', 'X-Bytes-Used'):
+            req_headers = dict(headers)
+            del req_headers[missing]
+            # a missing or deleted account is still a 404
+            for account, status in (('missing', 404), ('deleted', 404),
+                                    ('a', 500), ('.a', 500)):
+                req = Request.blank(
+                    '/sda1/p/%s/c' % account,
+                    environ={'REQUEST_METHOD': 'PUT'}, headers=req_headers)
+                resp = req.get_response(self.controller)
+                self.assertEqual(resp.status_int, status,
+                                 (missing, account))
+
+    def test_PUT_container_stats_db(self):
+        self._put_account('a')
+
+        def do_test(account, container, extra_headers, expected_status):
+            broker = self.controller._get_account_broker('sda1', 'p', account)
+            headers = {'X-PUT-Timestamp': next(self.ts).internal,
+                       'X-DELETE-Timestamp': '0',
+                       'X-Object-Count': '1',
+                       'X-Bytes-Used': '1',
+                       'X-Timestamp': next(self.ts).internal}
+            headers.update(extra_headers)
+            req = Request.blank(
+                '/sda1/p/%s/%s' % (account, container),
+                environ={'REQUEST_METHOD': 'PUT'}, headers=headers)
+            with mock.patch('os.path.exists',
+                            wraps=os.path.exists) as mock_exists:
+                resp = req.get_response(self.controller)
+            self.assertEqual(resp.status_int, expected_status)
+            return len([c for c in mock_exists.call_args_list
+                        if c == mock.call(broker.db_file)])
+
+        # the server leaves the existence check to is_deleted(); the other
+        # two are is_deleted()'s and put_container()'s own
+        self.assertEqual(3, do_test('a', 'c1', {}, 201))
+        # with an override only the server checks before put_container()
+        self.assertEqual(2, do_test(
+            'a', 'c2', {'X-Account-Override-Deleted': 'yes'}, 201))
+        # a newly created auto-create account isn't checked again; the
+        # others are initialize()'s and put_container()'s, plus is_deleted()'s
+        # without an override
+        self.assertEqual(4, do_test('.a', 'c', {}, 201))
+        self.assertEqual(3, do_test(
+            '.b', 'c', {'X-Account-Override-Deleted': 'yes'}, 201))
+        # a missing db is a 404 either way
+        self.assertEqual(1, do_test('missing', 'c', {}, 404))
+        self.assertEqual(1, do_test(
+            'missing', 'c', {'X-Account-Override-Deleted': 'yes'}, 404))
+
     def test_PUT_insufficient_space(self):
         conf = {'devices': self.testdir,
                 'mount_check': 'false',
@@ -647,6 +771,14 @@ class TestAccountController(unittest.TestCase):
             get_test_meta('POST', {'x-account-meta-' + wsgi_str: wsgi_str}),
             {u'X-Account-Meta-' + uni_str: [uni_str, ts_str]})
 
+        # bare prefixes and other headers are not persisted
+        self.assertEqual(
+            get_test_meta('POST', {'x-account-meta-': 'v1',
+                                   'x-account-sysmeta-': 'v2',
+                                   'x-container-meta-foo': 'v3',
+                                   'x-account-meta-foo-bar': 'v4'}),
+            {u'X-Account-Meta-Foo-Bar': [u'v4', ts_str]})
+
     def test_PUT_GET_metadata(self):
         # Set metadata header
         req = Request.blank(
@@ -876,6 +1008,227 @@ class TestAccountController(unittest.TestCase):
         self.assertEqual(resp.status_int, 204)
         self.assertNotIn(hdr, resp.headers)
 
+    def test_get_db_path_cache(self):
+        expected = os.path.join(
+            self.testdir, 'sda1', storage_directory(
+                'accounts', 'p', hash_path('a')), hash_path('a') + '.db')
+        with mock.patch('swift.account.server.hash_path',
+                        side_effect=hash_path) as mock_hash:
+            self.assertEqual(expected,
+                             self.controller._get_db_path('sda1', 'p', 'a'))
+            self.assertEqual(expected,
+                             self.controller._get_db_path('sda1', 'p', 'a'))
+            self.assertEqual(expected, self.controller._get_account_broker(
+                'sda1', 'p', 'a').db_file)
+        self.assertEqual([mock.call('a')], mock_hash.call_args_list)
+
+        self.controller.max_db_path_cache_size = 2
+        self.controller._get_db_path('sda1', 'p', 'b')
+        self.assertEqual(2, len(self.controller._db_path_cache))
+        self.controller._get_db_path('sda1', 'p', 'c')
+        self.assertEqual({('sda1', 'p', 'c')},
+                         set(self.controller._db_path_cache))
+
+    def test_writer_lock(self):
+        lock = self.controller._writer_lock('/path/to/a.db')
+        self.assertIs(lock, self.controller._writer_lock('/path/to/a.db'))
+        self.assertIsNot(lock, self.controller._writer_lock('/path/to/b.db'))
+        del lock
+        self.assertNotIn('/path/to/a.db', self.controller._write_locks)
+
+    def test_writes_hold_writer_lock(self):
+        held = []
+        orig_update_metadata = AccountBroker.update_metadata
+        orig_delete_db = AccountBroker.delete_db
+        orig_put_container = AccountBroker.put_container
+
+        def check_locked(broker):
+            lock = self.controller._write_locks.get(broker.db_file)
+            held.append(lock is not None and lock.locked())
+
+        def fake_update_metadata(broker, *args, **kwargs):
+            check_locked(broker)
+            return orig_update_metadata(broker, *args, **kwargs)
+
+        def fake_delete_db(broker, *args, **kwargs):
+            check_locked(broker)
+            return orig_delete_db(broker, *args, **kwargs)
+
+        def fake_put_container(broker, *args, **kwargs):
+            check_locked(broker)
+            return orig_put_container(broker, *args, **kwargs)
+
+        container_update_headers = {
+            'X-Put-Timestamp': normalize_timestamp(1),
+            'X-Delete-Timestamp': normalize_timestamp(0),
+            'X-Object-Count': '0',
+            'X-Bytes-Used': '0'}
+        with mock.patch.object(AccountBroker, 'update_metadata',
+                               fake_update_metadata), \
+                mock.patch.object(AccountBroker, 'delete_db',
+                                  fake_delete_db), \
+                mock.patch.object(AccountBroker, 'put_container',
+                                  fake_put_container):
+            for method, path, headers, status in (
+                    ('PUT', '/sda1/p/a', {}, 201),
+                    ('PUT', '/sda1/p/a/c', container_update_headers, 201),
+                    ('POST', '/sda1/p/a', {}, 204),
+                    ('DELETE', '/sda1/p/a', {}, 204)):
+                headers = dict(headers, **{
+                    'X-Timestamp': next(self.ts).internal,
+                    'X-Account-Meta-Test': 'Value'})
+                req = Request.blank(
+                    path, environ={'REQUEST_METHOD': method},
+                    headers=headers)
+                resp = req.get_response(self.controller)
+                self.assertEqual(resp.status_int, status)
+        # update_metadata is also called by delete_db
+        self.assertEqual([True] * 5, held)
+        # nothing is held once the requests are done
+        self.assertFalse(any(lock.locked() for lock in
+                             self.controller._write_locks.values()))
+
+    def _put_account(self, account):
+        req = Request.blank(
+            '/sda1/p/%s' % account, environ={'REQUEST_METHOD': 'PUT'},
+            headers={'X-Timestamp': next(self.ts).internal})
+        resp = req.get_response(self.controller)
+        self.assertEqual(resp.status_int, 201)
+        return self.controller._get_account_broker('sda1', 'p', account)
+
+    def _file_id(self, db_file):
+        st = os.stat(db_file)
+        return (st.st_dev, st.st_ino)
+
+    def _replace_db_file(self, db_file):
+        os.rename(db_file, db_file + '.tmp')
+        with open(db_file + '.tmp', 'rb') as src, open(db_file, 'wb') as dst:
+            dst.write(src.read())
+
+    def test_read_connection_pool(self):
+        self.controller.db_connection_pool_size = 10
+        db_file = self._put_account('a').db_file
+        self.assertFalse(self.controller._read_pool)
+        for method in ('HEAD', 'GET'):
+            req = Request.blank('/sda1/p/a',
+                                environ={'REQUEST_METHOD': method})
+            resp = req.get_response(self.controller)
+            self.assertEqual(resp.status_int // 100, 2)
+            self.assertEqual([db_file], list(self.controller._read_pool))
+            file_id, conns = self.controller._read_pool[db_file]
+            self.assertEqual(self._file_id(db_file), file_id)
+            self.assertEqual(1, len(conns))
+            self.assertEqual(1, self.controller._pooled_connection_count)
+        conn = conns[0]
+
+        # the pooled connection is reused
+        with mock.patch('swift.common.db.get_db_connection') as mock_connect:
+            req = Request.blank('/sda1/p/a',
+                                environ={'REQUEST_METHOD': 'HEAD'})
+            resp = req.get_response(self.controller)
+        self.assertEqual(resp.status_int, 204)
+        self.assertFalse(mock_connect.called)
+        self.assertEqual((file_id, [conn]),
+                         self.controller._read_pool[db_file])
+
+        # but not once the db file is replaced; every connection pooled for
+        # the old file is dropped
+        other_conn = mock.MagicMock()
+        self.controller._checkin_db_connection(db_file, file_id, other_conn)
+        self.assertEqual(2, self.controller._pooled_connection_count)
+        self._replace_db_file(db_file)
+        req = Request.blank('/sda1/p/a', environ={'REQUEST_METHOD': 'HEAD'})
+        resp = req.get_response(self.controller)
+        self.assertEqual(resp.status_int, 204)
+        self.assertEqual([mock.call.close()], other_conn.mock_calls)
+        new_file_id, conns = self.controller._read_pool[db_file]
+        self.assertNotEqual(file_id, new_file_id)
+        self.assertEqual(1, len(conns))
+        self.assertIsNot(conn, conns[0])
+        self.assertEqual(1, self.controller._pooled_connection_count)
+
+    def test_read_connection_pool_replaced_while_in_use(self):
+        self.controller.db_connection_pool_size = 10
+        db_file = self._put_account('a').db_file
+        file_id = self._file_id(db_file)
+        pooled_conn = mock.MagicMock()
+        self.controller._checkin_db_connection(db_file, file_id,
+                                               pooled_conn)
+        with self.controller._pooled_account_broker(
+                'sda1', 'p', 'a') as broker:
+            self.assertIs(pooled_conn, broker.conn)
+            self.controller._checkin_db_connection(db_file, file_id,
+                                                   mock.MagicMock())
+            self._replace_db_file(db_file)
+        # neither the returned nor the idle connection is kept
+        pooled_conn.close.assert_called_once_with()
+        self.assertFalse(self.controller._read_pool)
+        self.assertEqual(0, self.controller._pooled_connection_count)
+
+        # nor one for a db that has gone away
+        conn = mock.MagicMock()
+        os.unlink(db_file)
+        self.controller._checkin_db_connection(db_file, file_id, conn)
+        self.assertEqual([mock.call.close()], conn.mock_calls)
+        self.assertFalse(self.controller._read_pool)
+
+    def test_read_connection_pool_limits(self):
+        # the pool size caps the total number of idle connections
+        self.controller.db_connection_pool_size = 2
+        db_files = [self._put_account(a).db_file for a in ('a1', 'a2', 'a3')]
+        for account in ('a1', 'a2', 'a1', 'a3'):
+            req = Request.blank('/sda1/p/%s' % account,
+                                environ={'REQUEST_METHOD': 'HEAD'})
+            resp = req.get_response(self.controller)
+            self.assertEqual(resp.status_int, 204)
+        # least recently used db is evicted
+        self.assertEqual([db_files[0], db_files[2]],
+                         list(self.controller._read_pool))
+        self.assertEqual(2, self.controller._pooled_connection_count)
+
+        # a1 already has one idle connection
+        self.controller.db_connection_pool_size = 10
+        file_id = self._file_id(db_files[0])
+        max_conns = self.controller.max_pooled_connections_per_db
+        conns = [mock.MagicMock() for _ in range(max_conns)]
+        for conn in conns:
+            self.controller._checkin_db_connection(db_files[0], file_id,
+                                                   conn)
+        self.assertEqual(conns[:-1],
+                         self.controller._read_pool[db_files[0]][1][1:])
+        self.assertEqual([mock.call.close()], conns[-1].mock_calls)
+        self.assertEqual([db_files[2], db_files[0]],
+                         list(self.controller._read_pool))
+        self.assertEqual(1 + max_conns,
+                         self.controller._pooled_connection_count)
+
+        # shrinking the cap closes connections of the least recently used
+        # db first
+        self.controller.db_connection_pool_size = max_conns - 1
+        self.controller._checkin_db_connection(
+            db_files[0], file_id, self.controller._checkout_db_connection(
+                db_files[0], file_id))
+        self.assertEqual([db_files[0]], list(self.controller._read_pool))
+        self.assertEqual(conns[:-1],
+                         self.controller._read_pool[db_files[0]][1])
+        self.assertEqual(max_conns - 1,
+                         self.controller._pooled_connection_count)
+
+    def test_read_connection_pool_disabled(self):
+        self.assertEqual(0, self.controller.db_connection_pool_size)
+        self._put_account('a')
+        req = Request.blank('/sda1/p/a', environ={'REQUEST_METHOD': 'HEAD'})
+        resp = req.get_response(self.controller)
+        self.assertEqual(resp.status_int, 204)
+        self.assertFalse(self.controller._read_pool)
+
+    def test_read_connection_pool_not_found(self):
+        self.controller.db_connection_pool_size = 10
+        req = Request.blank('/sda1/p/a', environ={'REQUEST_METHOD': 'HEAD'})
+        resp = req.get_response(self.controller)
+        self.assertEqual(resp.status_int, 404)
+        self.assertFalse(self.controller._read_pool)
+
     def test_POST_invalid_partition(self):
         req = Request.blank('/sda1/./a', environ={'REQUEST_METHOD': 'POST',
                                                   'HTTP_X_TIMESTAMP': '1'})
@@ -2548,6 +2901,75 @@ class TestAccountController(unittest.TestCase):
             response = self.controller.__call__(env, start_response)
             self.assertEqual(response, answer)
 
+    def test_handlers(self):
+        for replication_server, expected in (
+                ('true', ['DELETE', 'GET', 'HEAD', 'OPTIONS', 'POST', 'PUT',
+                          'REPLICATE']),
+                ('false', ['DELETE', 'GET', 'HEAD', 'OPTIONS', 'POST',
+                           'PUT'])):
+            controller = AccountController(
+                {'devices': self.testdir, 'mount_check': 'false',
+                 'replication_server': replication_server})
+            self.assertIsNone(controller._handlers)
+            req = Request.blank('/sda1/p/a', method='HEAD')
+            resp = req.get_response(controller)
+            self.assertEqual(resp.status_int, 404)
+            self.assertEqual(expected, sorted(controller._handlers))
+            self.assertEqual(controller.allowed_methods,
+                             sorted(controller._handlers))
+            handlers = controller._handlers
+            resp = req.get_response(controller)
+            self.assertIs(handlers, controller._handlers)
+
+    def test_account_request_prelude(self):
+        self.controller.mount_check_cache_ttl = 0
+        for method in ('DELETE', 'HEAD', 'GET', 'POST'):
+            handler = getattr(self.controller, method)
+            self.assertEqual(method, handler.__name__)
+            self.assertTrue(handler.publicly_accessible)
+            with mock.patch.object(self.controller, '_get_account_broker',
+                                   side_effect=Exception('not reached')), \
+                    mock.patch.object(self.controller,
+                                      '_pooled_account_broker',
+                                      side_effect=Exception('not reached')):
+                req = Request.blank('/sda1/p', method=method,
+                                    headers={'X-Timestamp': '1'})
+                resp = req.get_response(self.controller)
+                self.assertEqual(400, resp.status_int, method)
+                req = Request.blank('/sda1/p/a', method=method,
+                                    headers={'X-Timestamp': '1'})
+                with mock.patch('swift.account.server.check_drive',
+                                side_effect=ValueError('unmounted')):
+                    resp = req.get_response(self.controller)
+                self.assertEqual(507, resp.status_int, method)
+                if method in ('DELETE', 'POST'):
+                    req = Request.blank('/sda1/p/a', method=method)
+                    resp = req.get_response(self.controller)
+                    self.assertEqual(400, resp.status_int, method)
+                    self.assertIn(b'Missing X-Timestamp', resp.body)
+
+    def test_account_request_prelude_precedence(self):
+        # request errors still take precedence over an unusable drive, in
+        # the same order as before the prelude was shared
+        self.controller.mount_check_cache_ttl = 0
+
+        def do_test(method, path, headers, expected):
+            req = Request.blank(path, method=method, headers=headers)
+            with mock.patch('swift.account.server.check_drive',
+                            side_effect=ValueError('unmounted')):
+                resp = req.get_response(self.controller)
+            self.assertEqual(expected, resp.status_int, (method, path))
+
+        do_test('DELETE', '/sda1/p/a', {}, 507)
+        do_test('POST', '/sda1/p/a', {}, 400)
+        for method in ('HEAD', 'GET'):
+            do_test(method, '/sda1/p/a', {'Accept': 'image/png'}, 406)
+            do_test(method, '/sda1/p/a', {'Accept': 'x;q=bad'}, 400)
+            do_test(method, '/sda1/p/a?format=json', {}, 507)
+        do_test('GET', '/sda1/p/a?prefix=%ff', {}, 400)
+        do_test('GET', '/sda1/p/a?limit=%d' % (ACCOUNT_LISTING_LIMIT + 1),
+                {}, 412)
+
     def test_replicaiton_server_call_all_methods(self):
         inbuf = BytesIO()
         errbuf = StringIO()
@@ -2648,8 +3070,8 @@ class TestAccountController(unittest.TestCase):
         self.controller.logger = debug_logger()
         with mock.patch(
                 'time.time',
-                mock.MagicMock(side_effect=[10000.0, 10001.0, 10002.0,
-                                            10002.0])):
+                mock.MagicMock(side_effect=[10000.0, 10000.0, 10001.0,
+                                            10002.0, 10002.0])):
             with mock.patch(
                     'os.getpid', mock.MagicMock(return_value=1234)):
                 req.get_response(self.controller)
@@ -2658,6 +3080,63 @@ class TestAccountController(unittest.TestCase):
             ['1.2.3.4 - - [01/Jan/1970:02:46:42 +0000] "HEAD /sda1/p/a" 404 '
              '- "-" "-" "-" 2.0000 "-" 1234 -'])
 
+    def test_log_queue(self):
+        logger = debug_logger()
+        controller = AccountController(
+            {'devices': self.testdir, 'mount_check': 'false',
+             'log_queue_size': '2'}, logger=logger)
+        self.assertIsNone(controller._log_queue)
+        for method in ('HEAD', 'GET', 'HEAD'):
+            req = Request.blank('/sda1/p/a', method=method)
+            resp = req.get_response(controller)
+            self.assertEqual(404, resp.status_int)
+        # nothing is written until the drainer gets to run, and the line
+        # that didn't fit in the queue is dropped
+        self.assertFalse(logger.get_lines_for_level('info'))
+        self.assertEqual({'log_queue.drops': 1},
+                         logger.get_increment_counts())
+        eventlet.sleep(0)
+        lines = logger.get_lines_for_level('info')
+        self.assertEqual(2, len(lines))
+        self.assertIn('"HEAD /sda1/p/a" 404', lines[0])
+        self.assertIn('"GET /sda1/p/a" 404', lines[1])
+
+        # the same queue and drainer keep being used
+        log_queue = controller._log_queue
+        req = Request.blank('/sda1/p/a', method='REPLICATE',
+                            headers={'Content-Length': '2'}, body=b'[]')
+        req.get_response(controller)
+        self.assertIs(log_queue, controller._log_queue)
+        self.assertFalse(logger.get_lines_for_level('debug'))
+        eventlet.sleep(0)
+        self.assertEqual(1, len(logger.get_lines_for_level('debug')))
+
+    def test_log_queue_drainer_survives_errors(self):
+        logger = debug_logger()
+        controller = AccountController(
+            {'devices': self.testdir, 'mount_check': 'false',
+             'log_queue_size': '10'}, logger=logger)
+        written = []
+
+        def log_func(msg):
+            if msg == 'bad':
+                raise ValueError('boom')
+            written.append(msg)
+
+        for msg in ('first', 'bad', 'second'):
+            controller._log_request(log_func, msg)
+        eventlet.sleep(0)
+        self.assertEqual(['first', 'second'], written)
+        error_lines = logger.get_lines_for_level('error')
+        self.assertEqual(1, len(error_lines))
+        self.assertIn('ERROR writing queued log line', error_lines[0])
+
+        # the same drainer keeps writing later lines
+        controller._log_request(log_func, 'third')
+        eventlet.sleep(0)
+        self.assertEqual(['first', 'second', 'third'], written)
+        self.assertFalse(logger.get_increment_counts())
+
     def test_policy_stats_with_legacy(self):
         ts = itertools.count()
         # create the account
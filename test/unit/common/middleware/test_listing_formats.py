@@ -14,9 +14,10 @@
 # limitations under the License.
 
 import json
+import mock
 import unittest
 
-from swift.common.swob import Request, HTTPOk, HTTPNoContent
+from swift.common.swob import Request, HTTPOk, HTTPNoContent, HTTPException
 from swift.common.middleware import listing_formats
 from swift.common.request_helpers import get_reserved_name
 from test.debug_logger import debug_logger
@@ -664,3 +665,33 @@ class TestListingFormats(unittest.TestCase):
         # assume it is and slap on the missing charset. If you set up staticweb
         # to serve back such responses, your clients are already hosed.
         do_test('/v1/staticweb/bad-json?format=json', expect_charset=True)
+
+    def test_get_listing_content_type(self):
+        def do_test(path, headers, expected):
+            req = Request.blank(path, headers=headers)
+            self.assertEqual(
+                expected, listing_formats.get_listing_content_type(req))
+            return req
+
+        with mock.patch('swift.common.swob.Accept.best_match') as mock_match:
+            req = do_test('/v1/a?format=json', {'Accept': 'text/xml'},
+                          'application/json')
+            self.assertEqual('application/json', req.headers['Accept'])
+            req = do_test('/v1/a?format=XML', {}, 'application/xml')
+            self.assertEqual('application/xml', req.headers['Accept'])
+            req = do_test('/v1/a?format=bogus', {}, 'text/plain')
+            self.assertEqual('text/plain', req.headers['Accept'])
+            req = do_test('/v1/a', {}, 'text/plain')
+            self.assertNotIn('Accept', req.headers)
+            do_test('/v1/a?format=', {'Accept': ''}, 'text/plain')
+        self.assertFalse(mock_match.called)
+
+        do_test('/v1/a', {'Accept': 'application/json'}, 'application/json')
+        do_test('/v1/a', {'Accept': 'text/*'}, 'text/plain')
+        do_test('/v1/a', {'Accept': 'application/*'}, 'application/json')
+        with self.assertRaises(HTTPException) as caught:
+            do_test('/v1/a', {'Accept': 'image/png'}, None)
+        self.assertEqual(406, caught.exception.status_int)
+        with self.assertRaises(HTTPException) as caught:
+            do_test('/v1/a', {'Accept': 'application/json;q=x'}, None)
+        self.assertEqual(400, caught.exception.status_int)
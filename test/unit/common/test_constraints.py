@@ -527,6 +527,16 @@ class TestConstraints(unittest.TestCase):
         self.assertTrue(constraints.check_utf8(unicode_sample))
         self.assertTrue(constraints.check_utf8(unicode_sample.encode('utf8')))
 
+        # pure ASCII, which skips decoding
+        self.assertTrue(constraints.check_utf8(b'/sda1/p/a'))
+        self.assertTrue(constraints.check_utf8(u'/sda1/p/a'))
+        self.assertFalse(constraints.check_utf8(b'/sda1/p/a\x00c'))
+        self.assertFalse(constraints.check_utf8(u'/sda1/p/a\x00c'))
+        self.assertTrue(constraints.check_utf8(b'/sda1/p/a\x00c',
+                                               internal=True))
+        self.assertTrue(constraints.check_utf8(u'/sda1/p/a\x00c',
+                                               internal=True))
+
     def test_check_utf8_internal(self):
         unicode_with_reserved = u'abc%sdef' % utils.RESERVED_STR
         # sanity
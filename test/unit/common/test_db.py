@@ -41,7 +41,8 @@ from swift.common.constraints import \
     MAX_META_VALUE_LENGTH, MAX_META_COUNT, MAX_META_OVERALL_SIZE
 from swift.common.db import chexor, dict_factory, get_db_connection, \
     DatabaseBroker, DatabaseConnectionError, DatabaseAlreadyExists, \
-    GreenDBConnection, PICKLE_PROTOCOL, zero_like, TombstoneReclaimer
+    GreenDBConnection, PICKLE_PROTOCOL, zero_like, TombstoneReclaimer, \
+    config_db_pragmas
 from swift.common.utils import normalize_timestamp, mkdirs, Timestamp
 from swift.common.exceptions import LockTimeout
 from swift.common.swob import HTTPException
@@ -73,6 +74,36 @@ class TestHelperFunctions(unittest.TestCase):
             self.fail('Some unexpected return values:\n' + '\n'.join(errors))
 
 
+class TestConfigDbPragmas(unittest.TestCase):
+
+    def setUp(self):
+        patcher = patch.multiple(swift.common.db, DB_SYNCHRONOUS='NORMAL',
+                                 DB_CACHE_SIZE=None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_defaults(self):
+        config_db_pragmas({})
+        self.assertEqual('NORMAL', swift.common.db.DB_SYNCHRONOUS)
+        self.assertIsNone(swift.common.db.DB_CACHE_SIZE)
+
+    def test_options(self):
+        config_db_pragmas({'db_synchronous': 'Full',
+                           'db_cache_size': '4000'})
+        self.assertEqual('FULL', swift.common.db.DB_SYNCHRONOUS)
+        self.assertEqual(4000, swift.common.db.DB_CACHE_SIZE)
+
+    def test_invalid_options(self):
+        for conf in ({'db_synchronous': 'extra'},
+                     {'db_cache_size': 'lots'},
+                     {'db_cache_size': '-4000'}):
+            with self.assertRaises(ValueError):
+                config_db_pragmas(conf)
+            # nothing is applied from an invalid conf
+            self.assertEqual('NORMAL', swift.common.db.DB_SYNCHRONOUS)
+            self.assertIsNone(swift.common.db.DB_CACHE_SIZE)
+
+
 class TestDatabaseConnectionError(unittest.TestCase):
 
     def test_str(self):
@@ -163,6 +194,39 @@ class TestGreenDBConnection(unittest.TestCase):
                              list((InterceptCursor.execute.call_args,) *
                                   InterceptCursor.execute.call_count))
 
+    def test_execute_lock_timeout_only_when_locked(self):
+        conn = sqlite3.connect(':memory:', check_same_thread=False,
+                               factory=GreenDBConnection, timeout=0.1)
+        with patch('swift.common.db.LockTimeout') as mock_timeout:
+            self.assertEqual([(1,)], conn.execute('select 1').fetchall())
+            conn.commit()
+        self.assertFalse(mock_timeout.called)
+
+        class InterceptCursor(sqlite3.Cursor):
+            pass
+        db_error = sqlite3.OperationalError('database is locked')
+        InterceptCursor.execute = MagicMock(side_effect=[db_error, 'done'])
+        with patch('sqlite3.Cursor', new=InterceptCursor), \
+                patch('swift.common.db.LockTimeout') as mock_timeout, \
+                patch('swift.common.db.sleep') as mock_sleep:
+            conn = sqlite3.connect(':memory:', check_same_thread=False,
+                                   factory=GreenDBConnection, timeout=0.1)
+            conn.execute('select 1')
+        self.assertEqual(2, InterceptCursor.execute.call_count)
+        mock_timeout.assert_called_once_with(0.1, ':memory:')
+        mock_sleep.assert_called_once_with(0.001)
+
+        InterceptCursor.execute = MagicMock(
+            side_effect=sqlite3.OperationalError('no such table: foo'))
+        with patch('sqlite3.Cursor', new=InterceptCursor), \
+                patch('swift.common.db.LockTimeout') as mock_timeout:
+            conn = sqlite3.connect(':memory:', check_same_thread=False,
+                                   factory=GreenDBConnection, timeout=0.1)
+            self.assertRaises(sqlite3.OperationalError, conn.execute,
+                              'select * from foo')
+        self.assertEqual(1, InterceptCursor.execute.call_count)
+        self.assertFalse(mock_timeout.called)
+
     def text_commit_when_locked(self):
         # This test is dependent on the code under test calling commit and
         # commit as sqlite3.Connection.commit in a subclass.
@@ -215,6 +279,22 @@ class TestGetDBConnection(TestDbBase):
         self.assertRaises(DatabaseConnectionError, get_db_connection,
                           'invalid database path / name')
 
+    def test_default_pragmas(self):
+        conn = get_db_connection(self.db_path)
+        self.assertEqual('delete', conn.execute(
+            'PRAGMA journal_mode').fetchone()[0])
+        # 1 == NORMAL
+        self.assertEqual(1, conn.execute('PRAGMA synchronous').fetchone()[0])
+
+    def test_configured_pragmas(self):
+        with patch.multiple(swift.common.db, DB_SYNCHRONOUS='FULL',
+                            DB_CACHE_SIZE=4000):
+            conn = get_db_connection(self.db_path)
+        # 2 == FULL
+        self.assertEqual(2, conn.execute('PRAGMA synchronous').fetchone()[0])
+        self.assertEqual(-4000, conn.execute(
+            'PRAGMA cache_size').fetchone()[0])
+
     def test_locked_db(self):
         # This test is dependent on the code under test calling execute and
         # commit as sqlite3.Cursor.execute in a subclass.
@@ -54,6 +54,13 @@ class TestHeaderEnvironProxy(unittest.TestCase):
         self.assertEqual(list(iter(proxy)), proxy.keys())
         self.assertEqual(4, len(proxy))
 
+    def test_environ_key_to_header(self):
+        for header in ('Something-Else', 'X-Account-Meta-Foo',
+                       # NB: WSGI string
+                       'X-Object-Meta-Unicode-\xff-Bu\xc3\x9fE'):
+            self.assertEqual(header, swob.environ_key_to_header(
+                swob.header_to_environ_key(header)))
+
     def test_ignored_keys(self):
         # Constructor doesn't normalize keys
         key = 'wsgi.input'
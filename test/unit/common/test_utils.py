@@ -3196,6 +3196,26 @@ cluster_dfw1 = http://dfw1.host/v1/
         self.assertIn(dt.Z, ('GMT', 'UTC'))  # It depends of Python 2/3
         self.assertRaises(ValueError, getattr, dt, 'z')
 
+    def test_str_format_time_cache(self):
+        with mock.patch.object(utils, 'datetime',
+                               wraps=utils.datetime) as mock_datetime:
+            dt = utils.StrFormatTime(20000.1)
+            self.assertEqual(dt.S, '20')
+            self.assertEqual(dt.M, '33')
+            # same second, directives already formatted
+            dt = utils.StrFormatTime(20000.9)
+            self.assertEqual(dt.S, '20')
+            self.assertEqual(dt.M, '33')
+            self.assertEqual(2, mock_datetime.datetime.call_count)
+            # a new second is formatted afresh
+            dt = utils.StrFormatTime(20001.0)
+            self.assertEqual(dt.S, '21')
+            self.assertEqual(dt.M, '33')
+            self.assertEqual(4, mock_datetime.datetime.call_count)
+            # going back in time works too
+            dt = utils.StrFormatTime(20000.5)
+            self.assertEqual(dt.S, '20')
+
     def test_get_log_line(self):
         req = Request.blank(
             '/sda1/p/a/c/o',